@@ -15,15 +15,49 @@ from office_metadata import (
     update_docx_metadata
 )
 import json
+import io
 import os
-import tempfile
 import base64
-from PIL import Image
 
 # App Configuration
 st.set_page_config(page_title="TagIt", layout="wide")
 st.title("📁 TagIt")
 
+
+# Cached metadata extraction (Streamlit reruns the script on every interaction)
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_image_metadata(content, name):
+    return format_metadata(extract_image_metadata(io.BytesIO(content)))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_pdf_metadata(content, name):
+    return extract_pdf_metadata(io.BytesIO(content))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_video_metadata(content, name):
+    video_file = io.BytesIO(content)
+    video_file.name = name
+    return extract_video_metadata(video_file)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_docx_metadata(content, name):
+    return extract_docx_metadata(io.BytesIO(content))
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_pptx_metadata(content, name):
+    return extract_pptx_metadata(io.BytesIO(content))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_pdf_base64(content):
+    # base64 output is pure ASCII, so skip UTF-8 validation when decoding
+    return base64.b64encode(content).decode('ascii')
+
+
 # Sidebar with file upload and instructions
 with st.sidebar:
     st.header("Upload File")
@@ -64,6 +98,13 @@ if uploaded_file:
     if 'modified_path' not in st.session_state:
         st.session_state.modified_path = None
     
+    # Extract metadata once per upload; edits then update it in session state
+    if st.session_state.get('upload_id') != uploaded_file.file_id:
+        st.session_state.upload_id = uploaded_file.file_id
+        st.session_state.current_metadata = None
+        st.session_state.modified_path = None
+        st.session_state.pop('modified_bytes', None)
+    
     # Main content layout
     col1, col2 = st.columns([1, 2])
     
@@ -74,7 +115,7 @@ if uploaded_file:
         elif file_type == "pdf":
             try:
                 st.markdown(f"""
-                <iframe src="data:application/pdf;base64,{base64.b64encode(uploaded_file.getvalue()).decode('utf-8')}" 
+                <iframe src="data:application/pdf;base64,{cached_pdf_base64(uploaded_file.getvalue())}" 
                         width="100%" 
                         height="500" 
                         type="application/pdf">
@@ -104,9 +145,9 @@ if uploaded_file:
         
         # Image processing
         if file_type == "image":
-            metadata = extract_image_metadata(uploaded_file)
-            formatted_metadata = format_metadata(metadata)
-            st.session_state.current_metadata = formatted_metadata
+            if st.session_state.current_metadata is None:
+                st.session_state.current_metadata = cached_image_metadata(uploaded_file.getvalue(), uploaded_file.name)
+            formatted_metadata = st.session_state.current_metadata
 
             with st.expander("📸 Image Metadata", expanded=True):
                 st.json(formatted_metadata)
@@ -130,22 +171,21 @@ if uploaded_file:
                             "DateTimeOriginal": new_datetime_orig,
                         }
                         try:
-                            updated_path = update_image_metadata(uploaded_file, changes)
+                            updated_path, new_meta = update_image_metadata(uploaded_file, changes)
 
-                            with open(updated_path, "rb") as f:
-                                new_meta = extract_image_metadata(f)
-                                st.session_state.current_metadata = format_metadata(new_meta)
-                                st.session_state.modified_path = updated_path
+                            st.session_state.current_metadata = format_metadata(new_meta)
+                            st.session_state.modified_path = updated_path
+                            st.session_state.pop('modified_bytes', None)
 
                             st.success("✅ Metadata successfully updated!")
-                            st.rerun()
 
                         except Exception as e:
                             st.error(f"❌ Update failed: {str(e)}")
 
         # PDF processing
         elif file_type == "pdf":
-            st.session_state.current_metadata = extract_pdf_metadata(uploaded_file)
+            if st.session_state.current_metadata is None:
+                st.session_state.current_metadata = cached_pdf_metadata(uploaded_file.getvalue(), uploaded_file.name)
 
             with st.expander("📄 PDF Metadata", expanded=True):
                 st.json(st.session_state.current_metadata)
@@ -165,23 +205,21 @@ if uploaded_file:
                                 "Author": new_author,
                             }
 
-                            updated_path = update_pdf_metadata(uploaded_file, changes)
+                            updated_path, new_meta = update_pdf_metadata(uploaded_file, changes)
 
-                            if not os.path.exists(updated_path):
-                                raise Exception("Modified file was not created")
-
-                            st.session_state.current_metadata = extract_pdf_metadata(updated_path)
+                            st.session_state.current_metadata = new_meta
                             st.session_state.modified_path = updated_path
+                            st.session_state.pop('modified_bytes', None)
                             
                             st.success("✅ Metadata successfully updated!")
-                            st.rerun()
 
                         except Exception as e:
                             st.error(f"❌ Update failed: {str(e)}")
 
         # Video processing
         elif file_type == "video":
-            st.session_state.current_metadata = extract_video_metadata(uploaded_file)
+            if st.session_state.current_metadata is None:
+                st.session_state.current_metadata = cached_video_metadata(uploaded_file.getvalue(), uploaded_file.name)
             
             with st.expander("🎥 Video Metadata", expanded=True):
                 st.json(st.session_state.current_metadata)
@@ -190,85 +228,65 @@ if uploaded_file:
 
         # Word documents (DOCX)
         elif file_type == "docx":
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_file:
-                uploaded_file.seek(0)
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
+            if st.session_state.current_metadata is None:
+                st.session_state.current_metadata = cached_docx_metadata(uploaded_file.getvalue(), uploaded_file.name)
             
-            try:
-                st.session_state.current_metadata = extract_docx_metadata(tmp_path)
-                
-                with st.expander("📝 Word Document Metadata", expanded=True):
-                    st.json(st.session_state.current_metadata['CoreProperties'])
-                
-                with st.expander("✏ Edit Metadata"):
-                    with st.form("docx_form"):
-                        title = st.text_input("Title", st.session_state.current_metadata['CoreProperties'].get('title', ''))
-                        author = st.text_input("Author", st.session_state.current_metadata['CoreProperties'].get('author', ''))
-                        subject = st.text_input("Subject", st.session_state.current_metadata['CoreProperties'].get('subject', ''))
-                        keywords = st.text_input("Keywords", st.session_state.current_metadata['CoreProperties'].get('keywords', ''))
-                        
-                        if st.form_submit_button("Update Metadata"):
-                            changes = {
-                                'title': title,
-                                'author': author,
-                                'subject': subject,
-                                'keywords': keywords
-                            }
-                            result = update_docx_metadata(tmp_path, changes)
-                            
-                            if isinstance(result, str) and os.path.exists(result):
-                                st.session_state.modified_path = result
-                                st.session_state.current_metadata = extract_docx_metadata(result)
-                                st.success("✅ Metadata successfully updated!")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ {result.get('Error', 'Update failed')}")
+            with st.expander("📝 Word Document Metadata", expanded=True):
+                st.json(st.session_state.current_metadata['CoreProperties'])
             
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+            with st.expander("✏ Edit Metadata"):
+                with st.form("docx_form"):
+                    title = st.text_input("Title", st.session_state.current_metadata['CoreProperties'].get('title', ''))
+                    author = st.text_input("Author", st.session_state.current_metadata['CoreProperties'].get('author', ''))
+                    subject = st.text_input("Subject", st.session_state.current_metadata['CoreProperties'].get('subject', ''))
+                    keywords = st.text_input("Keywords", st.session_state.current_metadata['CoreProperties'].get('keywords', ''))
+                    
+                    if st.form_submit_button("Update Metadata"):
+                        changes = {
+                            'title': title,
+                            'author': author,
+                            'subject': subject,
+                            'keywords': keywords
+                        }
+                        result = update_docx_metadata(uploaded_file, changes)
+                        
+                        if isinstance(result, tuple):
+                            st.session_state.modified_path, st.session_state.current_metadata = result
+                            st.session_state.pop('modified_bytes', None)
+                            st.success("✅ Metadata successfully updated!")
+                        else:
+                            st.error(f"❌ {result.get('Error', 'Update failed')}")
 
         # PowerPoint files (PPTX)
         elif file_type == "pptx":
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as tmp_file:
-                uploaded_file.seek(0)
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
+            if st.session_state.current_metadata is None:
+                st.session_state.current_metadata = cached_pptx_metadata(uploaded_file.getvalue(), uploaded_file.name)
             
-            try:
-                st.session_state.current_metadata = extract_pptx_metadata(tmp_path)
-                
-                with st.expander("📊 PowerPoint Metadata", expanded=True):
-                    st.json(st.session_state.current_metadata['CoreProperties'])
-                
-                with st.expander("✏ Edit Metadata"):
-                    with st.form("pptx_form"):
-                        title = st.text_input("Title", st.session_state.current_metadata['CoreProperties'].get('title', ''))
-                        author = st.text_input("Author", st.session_state.current_metadata['CoreProperties'].get('author', ''))
-                        subject = st.text_input("Subject", st.session_state.current_metadata['CoreProperties'].get('subject', ''))
-                        keywords = st.text_input("Keywords", st.session_state.current_metadata['CoreProperties'].get('keywords', ''))
-                        
-                        if st.form_submit_button("Update Metadata"):
-                            changes = {
-                                'title': title,
-                                'author': author,
-                                'subject': subject,
-                                'keywords': keywords
-                            }
-                            result = update_pptx_metadata(tmp_path, changes)
-                            
-                            if isinstance(result, str) and os.path.exists(result):
-                                st.session_state.modified_path = result
-                                st.session_state.current_metadata = extract_pptx_metadata(result)
-                                st.success("✅ Metadata successfully updated!")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ {result.get('Error', 'Update failed')}")
+            with st.expander("📊 PowerPoint Metadata", expanded=True):
+                st.json(st.session_state.current_metadata['CoreProperties'])
             
-            finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+            with st.expander("✏ Edit Metadata"):
+                with st.form("pptx_form"):
+                    title = st.text_input("Title", st.session_state.current_metadata['CoreProperties'].get('title', ''))
+                    author = st.text_input("Author", st.session_state.current_metadata['CoreProperties'].get('author', ''))
+                    subject = st.text_input("Subject", st.session_state.current_metadata['CoreProperties'].get('subject', ''))
+                    keywords = st.text_input("Keywords", st.session_state.current_metadata['CoreProperties'].get('keywords', ''))
+                    
+                    if st.form_submit_button("Update Metadata"):
+                        changes = {
+                            'title': title,
+                            'author': author,
+                            'subject': subject,
+                            'keywords': keywords
+                        }
+                        result = update_pptx_metadata(uploaded_file, changes)
+                        
+                        if isinstance(result, tuple):
+                            st.session_state.modified_path, st.session_state.current_metadata = result
+                            st.session_state.pop('modified_bytes', None)
+                            st.success("✅ Metadata successfully updated!")
+                        else:
+                            st.error(f"❌ {result.get('Error', 'Update failed')}")
         
         else:
             st.error("Unsupported file type!")
@@ -289,14 +307,19 @@ if uploaded_file:
             )
     
     with col_d2:
-        if st.session_state.modified_path and os.path.exists(st.session_state.modified_path):
-            with open(st.session_state.modified_path, "rb") as f:
-                st.download_button(
-                    label="⬇ Download Modified File",
-                    data=f,
-                    file_name=f"modified_{uploaded_file.name}",
-                    mime="application/octet-stream"
-                )
+        if st.session_state.modified_path:
+            # Read the modified file once per update instead of on every rerun,
+            # then remove it so repeated edits don't pile up in the temp dir
+            if 'modified_bytes' not in st.session_state:
+                with open(st.session_state.modified_path, "rb") as f:
+                    st.session_state.modified_bytes = f.read()
+                os.unlink(st.session_state.modified_path)
+            st.download_button(
+                label="⬇ Download Modified File",
+                data=st.session_state.modified_bytes,
+                file_name=f"modified_{uploaded_file.name}",
+                mime="application/octet-stream"
+            )
 
 else:
     st.info("👈 Please upload a file to view and edit its metadata")
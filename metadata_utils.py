@@ -1,15 +1,58 @@
 # Back-end Metadata extraction
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
-import pdfrw
+# PIL and PyMuPDF are imported inside the functions that need them so
+# the app starts without loading them until a matching file is uploaded
 from datetime import datetime
-from pdfrw.objects import PdfName, PdfString, PdfDict
+import io
+import json
 import os
+import shutil
+import subprocess
 import tempfile
-from pymediainfo import MediaInfo
 import piexif
 
 
+# Uploads are copied to disk in 1 MiB chunks instead of one large read
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# ffprobe only parses container headers and prints them as JSON
+FFPROBE_COMMAND = [
+    "ffprobe", "-v", "quiet", "-print_format", "json",
+    "-show_format", "-show_streams", "-i",
+]
+
+# EXIF fields shown under "Basic Info"
+BASIC_INFO_KEYS = ("Make", "Model", "Software", "DateTime", "DateTimeOriginal")
+
+# Editable field names mapped to their (IFD, EXIF tag)
+EXIF_TAG_MAP = {
+    "Make": ("0th", piexif.ImageIFD.Make),
+    "Model": ("0th", piexif.ImageIFD.Model),
+    "Software": ("0th", piexif.ImageIFD.Software),
+    "DateTime": ("0th", piexif.ImageIFD.DateTime),
+    "DateTimeOriginal": ("Exif", piexif.ExifIFD.DateTimeOriginal),
+    "Artist": ("0th", piexif.ImageIFD.Artist),
+    "Copyright": ("0th", piexif.ImageIFD.Copyright),
+    "ImageDescription": ("0th", piexif.ImageIFD.ImageDescription),
+}
+
+# IFD pointer tags that piexif keeps in the 0th IFD
+EXIF_POINTER_TAGS = (piexif.ImageIFD.ExifTag, piexif.ImageIFD.GPSTag)
+
+# PyMuPDF metadata keys mapped to their PDF Info dictionary names
+PDF_INFO_KEYS = {
+    "title": "Title",
+    "author": "Author",
+    "subject": "Subject",
+    "keywords": "Keywords",
+    "creator": "Creator",
+    "producer": "Producer",
+    "creationDate": "CreationDate",
+    "modDate": "ModDate",
+    "trapped": "Trapped",
+}
+PDF_INFO_FIELDS = {name: key for key, name in PDF_INFO_KEYS.items()}
+
+
 def get_file_type(uploaded_file):
     """Determine file type based on MIME type"""
     if uploaded_file.type.startswith("image/"):
@@ -23,7 +66,24 @@ def get_file_type(uploaded_file):
 
 def extract_image_metadata(uploaded_file):
     """Extract metadata from image files including EXIF data"""
-    img = Image.open(uploaded_file)
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+
+    # piexif only parses the APP1 EXIF segment, so try it before PIL
+    try:
+        exif_dict = piexif.load(data)
+    except Exception:
+        exif_dict = {}
+
+    metadata = exif_to_metadata(exif_dict)
+    if metadata:
+        return metadata
+
+    # No EXIF segment piexif can read (e.g. PNG): Image.open only parses headers
+    from PIL import Image
+    from PIL.ExifTags import TAGS, GPSTAGS
+
+    img = Image.open(io.BytesIO(data))
     exif_data = img._getexif() or {}
 
     if exif_data:
@@ -45,17 +105,45 @@ def extract_image_metadata(uploaded_file):
     return metadata
 
 
+def exif_to_metadata(exif_dict):
+    """Convert a piexif dict into tag-name keyed metadata"""
+    metadata = {}
+    for ifd in ("0th", "Exif"):
+        for tag, value in exif_dict.get(ifd, {}).items():
+            if tag not in EXIF_POINTER_TAGS:
+                name, value = decode_exif_value(ifd, tag, value)
+                metadata[name] = value
+    gps_info = dict(
+        decode_exif_value("GPS", tag, value)
+        for tag, value in exif_dict.get("GPS", {}).items()
+    )
+    if gps_info:
+        metadata["GPSInfo"] = gps_info
+    return metadata
+
+
+def decode_exif_value(ifd, tag, value):
+    """Return the tag name and a readable value for a raw piexif entry"""
+    tag_info = piexif.TAGS[ifd].get(tag, {})
+    tag_type = tag_info.get("type")
+
+    if tag_type == piexif.TYPES.Ascii and isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace').rstrip('\x00')
+    elif tag_type in (piexif.TYPES.Rational, piexif.TYPES.SRational):
+        if value and isinstance(value[0], tuple):
+            value = tuple(num / den if den else 0.0 for num, den in value)
+        elif value:
+            value = value[0] / value[1] if value[1] else 0.0
+
+    return tag_info.get("name", tag), value
+
+
 def format_metadata(raw_metadata):
     """Format raw metadata into a structured dictionary"""
-    if any(raw_metadata.get(key) for key in ["Make", "Model", "Software", "DateTime", "DateTimeOriginal"]):
+    basic_info = {key: raw_metadata.get(key) for key in BASIC_INFO_KEYS}
+    if any(basic_info.values()):
         formatted = {
-            "Basic Info": {
-                "Make": raw_metadata.get("Make"),
-                "Model": raw_metadata.get("Model"),
-                "Software": raw_metadata.get("Software"),
-                "DateTime": raw_metadata.get("DateTime"),
-                "DateTimeOriginal": raw_metadata.get("DateTimeOriginal")
-            },
+            "Basic Info": basic_info,
             "GPS Info": parse_gps(raw_metadata.get("GPSInfo", {})),
         }
     else:
@@ -78,116 +166,146 @@ def format_metadata(raw_metadata):
 
 def parse_gps(gps):
     """Parse GPS coordinates into human-readable format"""
-    if not gps:
+    latitude = gps.get("GPSLatitude") if gps else None
+    if not latitude:
         return None
-    return {
-        "GPSLatitude": f"{gps['GPSLatitude'][0]}° {gps['GPSLatitude'][1]}' {gps['GPSLatitude'][2]}\" {gps['GPSLatitudeRef']}",
-        "GPSLongitude": f"{gps['GPSLongitude'][0]}° {gps['GPSLongitude'][1]}' {gps['GPSLongitude'][2]}\" {gps['GPSLongitudeRef']}",
-        "GPSTimeStamp": f"{gps['GPSTimeStamp'][0]}:{gps['GPSTimeStamp'][1]}:{gps['GPSTimeStamp'][2]} UTC"
+
+    parsed = {
+        "GPSLatitude": "{}° {}' {}\" {}".format(*map(float, latitude), gps.get("GPSLatitudeRef", "")),
     }
+    longitude = gps.get("GPSLongitude")
+    if longitude:
+        parsed["GPSLongitude"] = "{}° {}' {}\" {}".format(*map(float, longitude), gps.get("GPSLongitudeRef", ""))
+    timestamp = gps.get("GPSTimeStamp")
+    if timestamp:
+        parsed["GPSTimeStamp"] = "{}:{}:{} UTC".format(*map(float, timestamp))
+    return parsed
+
+
+def pdf_document_metadata(doc):
+    """Build the metadata dictionary for an open PyMuPDF document"""
+    # PyMuPDF only reads the xref and Info dict here, not the page tree
+    raw_info = doc.metadata or {}
+
+    metadata = {}
+    for key, value in raw_info.items():
+        if key in PDF_INFO_KEYS and value:
+            metadata[PDF_INFO_KEYS[key]] = value
+
+    metadata.update({
+        "PDFVersion": (raw_info.get("format") or "").replace("PDF ", ""),
+        "PageCount": doc.page_count,
+        "ExtractedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+    return metadata
 
 
 def extract_pdf_metadata(uploaded_file):
-    """Extract metadata from PDF files with robust error handling"""
+    """
+    Extract metadata from PDF files with robust error handling.
+    Only the trailer, xref and Info dictionary are read, so the cost depends
+    on the header rather than the file size (linearized PDFs included).
+    """
+    import pymupdf
+
     try:
         uploaded_file.seek(0)
-        pdf = pdfrw.PdfReader(uploaded_file)
-        raw_info = pdf.Info or {}
-
-        metadata = {}
-        for key, value in raw_info.items():
-            clean_key = key.lstrip('/') if isinstance(key, str) else str(key)
-            metadata[clean_key] = clean_pdf_value(value)
-
-        metadata.update({
-            "PDFVersion": str(pdf.Version),
-            "PageCount": len(pdf.pages) if hasattr(pdf, 'pages') else 0,
-            "ExtractedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-        return metadata
+        with pymupdf.open(stream=uploaded_file.read(), filetype="pdf") as doc:
+            # The Info dictionary of a password-protected PDF cannot be read
+            if doc.needs_pass:
+                return {"Encrypted": True, "PageCount": doc.page_count}
+
+            return pdf_document_metadata(doc)
 
     except Exception as e:
         return {"Error": f"Failed to read PDF metadata: {str(e)}"}
 
 
-def clean_pdf_value(value):
-    """Clean and decode PDF metadata values"""
-    if value is None:
-        return ""
-
-    if isinstance(value, pdfrw.objects.PdfString):
-        try:
-            return value.decode('utf-8')
-        except:
-            try:
-                return value.decode('latin-1')
-            except:
-                return str(value)
-
-    if isinstance(value, (bytes, bytearray)):
-        try:
-            return value.decode('utf-8', errors='replace')
-        except:
-            return str(value)
-
-    if hasattr(value, '__iter__') and not isinstance(value, str):
-        return str([clean_pdf_value(item) for item in value])
-
-    return str(value)
-
-
 def update_pdf_metadata(uploaded_file, changes):
-    """Update PDF metadata and return path to modified file"""
+    """Update PDF metadata and return path to modified file with its new metadata"""
+    import pymupdf
+
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+        # A unique file per update so concurrent sessions never share an output
+        with tempfile.NamedTemporaryFile(delete=False, prefix='modified_', suffix='.pdf') as out_file:
+            output_path = out_file.name
             uploaded_file.seek(0)
-            tmp_file.write(uploaded_file.read())
-            tmp_path = tmp_file.name
+            shutil.copyfileobj(uploaded_file, out_file, length=COPY_CHUNK_SIZE)
 
-        pdf = pdfrw.PdfReader(tmp_path)
+        rewrite_path = None
+        with pymupdf.open(output_path) as doc:
+            metadata = doc.metadata or {}
 
-        if not pdf.Info:
-            pdf.Info = pdfrw.PdfDict()
+            for key, value in changes.items():
+                if value and str(value).strip():
+                    metadata[PDF_INFO_FIELDS.get(key, key)] = str(value)
 
-        for key, value in changes.items():
-            if value and str(value).strip():
-                pdf.Info[pdfrw.PdfName(key)] = pdfrw.PdfString(str(value))
-
-        output_path = f"modified_{uploaded_file.name}"
-        pdfrw.PdfWriter().write(output_path, pdf)
-
-        updated_pdf = pdfrw.PdfReader(output_path)
-        if not all(pdfrw.PdfName(k) in updated_pdf.Info for k in changes.keys()):
-            raise Exception("Metadata update verification failed")
+            doc.set_metadata(metadata)
+            if doc.can_save_incrementally():
+                # Incremental save only appends the new Info object and xref section
+                doc.save(output_path, incremental=True, encryption=pymupdf.PDF_ENCRYPT_KEEP)
+            else:
+                # Files MuPDF had to repair on open can only be rewritten in full
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+                    rewrite_path = tmp_file.name
+                doc.save(rewrite_path, encryption=pymupdf.PDF_ENCRYPT_KEEP)
+            updated_metadata = pdf_document_metadata(doc)
 
-        os.unlink(tmp_path)
+        if rewrite_path:
+            os.replace(rewrite_path, output_path)
 
-        return output_path
+        return output_path, updated_metadata
 
     except Exception as e:
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        if 'rewrite_path' in locals() and rewrite_path and os.path.exists(rewrite_path):
+            os.unlink(rewrite_path)
+        if 'output_path' in locals() and os.path.exists(output_path):
+            os.unlink(output_path)
         raise Exception(f"Failed to update PDF: {str(e)}")
 
 
+def run_ffprobe(source, data=None):
+    """Run ffprobe on a path (or stdin when data is given) and return parsed JSON"""
+    result = subprocess.run(
+        FFPROBE_COMMAND + [source],
+        input=data,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return {}
+    return json.loads(result.stdout or b"{}")
+
+
 def extract_video_metadata(uploaded_file):
-    """Extract metadata from video files using MediaInfo"""
+    """Extract metadata from video files using ffprobe"""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp:
-            uploaded_file.seek(0)
-            tmp.write(uploaded_file.read())
-            tmp_path = tmp.name
-
-        media_info = MediaInfo.parse(tmp_path)
-        os.unlink(tmp_path)
+        # ffprobe reads the container headers from stdin and stops there
+        data = uploaded_file.getvalue()
+        probe = run_ffprobe("pipe:0", data)
 
-        metadata = {}
-        for track in media_info.tracks:
-            track_info = {}
-            for key, value in track.to_data().items():
-                if value:
-                    track_info[key] = value
-            metadata[track.track_type] = track_info
+        if "format" not in probe:
+            # Containers with their index at the end (e.g. MOV) need a seekable file
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1])
+            try:
+                with tmp:
+                    uploaded_file.seek(0)
+                    shutil.copyfileobj(uploaded_file, tmp, length=COPY_CHUNK_SIZE)
+                probe = run_ffprobe(tmp.name)
+            finally:
+                os.unlink(tmp.name)
+
+        if "format" not in probe:
+            raise Exception("ffprobe could not read the container")
+
+        general = probe["format"]
+        general["filename"] = uploaded_file.name
+
+        metadata = {"General": general}
+        for stream in probe.get("streams", []):
+            track_type = stream.get("codec_type", "other").capitalize()
+            if track_type in metadata:
+                track_type = f"{track_type} #{stream.get('index')}"
+            metadata[track_type] = {key: value for key, value in stream.items() if value}
 
         return metadata
     except Exception as e:
@@ -198,53 +316,32 @@ def update_image_metadata(uploaded_file, changes):
     """
     Update image EXIF metadata based on changes dict.
     Supports updates for tags in the 0th IFD (ImageIFD) and ExifIFD.
-    Returns path to updated image file.
+    Returns path to updated image file and its updated raw metadata.
     """
     try:
-        # Create temporary input file
-        tmp_in = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1])
+        # piexif reads and rewrites the JPEG from memory, so only the output touches disk
         uploaded_file.seek(0)
-        tmp_in.write(uploaded_file.read())
-        tmp_in.close()
+        data = uploaded_file.read()
 
         # Load existing EXIF data
-        exif_dict = piexif.load(tmp_in.name)
-
-        # Map common field names to EXIF tags
-        tag_map = {
-            "Make": piexif.ImageIFD.Make,
-            "Model": piexif.ImageIFD.Model,
-            "Software": piexif.ImageIFD.Software,
-            "DateTime": piexif.ImageIFD.DateTime,
-            "DateTimeOriginal": piexif.ExifIFD.DateTimeOriginal,
-            "Artist": piexif.ImageIFD.Artist,
-            "Copyright": piexif.ImageIFD.Copyright,
-            "ImageDescription": piexif.ImageIFD.ImageDescription
-        }
+        exif_dict = piexif.load(data)
 
         # Apply changes to EXIF data
         for key, value in changes.items():
-            if value and key in tag_map:
-                if key == "DateTimeOriginal":
-                    ifd = "Exif"
-                else:
-                    ifd = "0th"
-                exif_dict[ifd][tag_map[key]] = value.encode('utf-8')
+            entry = EXIF_TAG_MAP.get(key)
+            if entry and value:
+                ifd, tag = entry
+                exif_dict[ifd][tag] = value.encode('utf-8')
 
         # Create output file with updated metadata
         tmp_out = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1])
-        piexif.insert(piexif.dump(exif_dict), tmp_in.name, tmp_out.name)
         tmp_out.close()
+        piexif.insert(piexif.dump(exif_dict), data, tmp_out.name)
 
-        # Clean up
-        os.unlink(tmp_in.name)
-
-        return tmp_out.name
+        return tmp_out.name, exif_to_metadata(exif_dict)
 
     except Exception as e:
-        # Clean up temporary files if error occurs
-        if 'tmp_in' in locals() and os.path.exists(tmp_in.name):
-            os.unlink(tmp_in.name)
+        # Clean up temporary file if error occurs
         if 'tmp_out' in locals() and os.path.exists(tmp_out.name):
             os.unlink(tmp_out.name)
         raise Exception(f"Failed to update image metadata: {str(e)}")
\ No newline at end of file
@@ -1,59 +1,149 @@
-from docx import Document
-from pptx import Presentation
 import tempfile
 import os
-from datetime import datetime
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
 
-def extract_docx_metadata(file_path):
+# Core property element names (any namespace) mapped to the keys we report
+CORE_XML_FIELDS = {
+    'title': 'title',
+    'creator': 'author',
+    'subject': 'subject',
+    'keywords': 'keywords',
+    'description': 'comments',
+    'lastModifiedBy': 'last_modified_by',
+    'created': 'created',
+    'modified': 'modified',
+    'category': 'category',
+    'contentStatus': 'content_status',
+    'identifier': 'identifier',
+    'language': 'language',
+    'revision': 'revision',
+    'version': 'version'
+}
+
+CORE_PART = 'docProps/core.xml'
+APP_PART = 'docProps/app.xml'
+
+# docProps/app.xml count elements mapped to the keys we report
+DOCX_APP_COUNTS = {
+    'Paragraphs': 'paragraph_count',
+    'Pages': 'page_count',
+    'Words': 'word_count'
+}
+
+PPTX_SLIDE_PART = re.compile(r'ppt/slides/slide\d+\.xml$')
+PPTX_NOTES_PART = re.compile(r'ppt/notesSlides/notesSlide\d+\.xml$')
+PPTX_MASTER_PART = re.compile(r'ppt/slideMasters/slideMaster\d+\.xml$')
+
+def iso_datetime(value):
+    """Format a core property timestamp, treating naive values as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+def core_properties_dict(props):
+    """Convert OOXML core properties into a plain dictionary"""
+    return {
+        'title': props.title or '',
+        'author': props.author or '',
+        'subject': props.subject or '',
+        'keywords': props.keywords or '',
+        'comments': props.comments or '',
+        'last_modified_by': props.last_modified_by or '',
+        'created': iso_datetime(props.created) if props.created else '',
+        'modified': iso_datetime(props.modified) if props.modified else '',
+        'category': props.category or '',
+        'content_status': props.content_status or '',
+        'identifier': props.identifier or '',
+        'language': props.language or '',
+        'revision': props.revision or '',
+        'version': props.version or ''
+    }
+
+def read_zip_part(zf, part_name):
+    """Return the raw bytes of a package part, or None if it is missing"""
+    if part_name not in zf.namelist():
+        return None
+    return zf.read(part_name)
+
+def package_parts(package):
+    """Map part names to parts for an already opened python-docx/pptx package"""
+    return {str(part.partname).lstrip('/'): part for part in package.iter_parts()}
+
+def read_xml_part(data):
+    """Return {local tag name: text} for the children of a small package part"""
+    if not data:
+        return {}
+    root = ET.fromstring(data)
+    return {child.tag.rsplit('}', 1)[-1]: child.text or '' for child in root}
+
+def read_core_properties(core_xml):
+    """Read docProps/core.xml without loading the document body"""
+    props = {key: '' for key in CORE_XML_FIELDS.values()}
+    for tag, text in read_xml_part(core_xml).items():
+        key = CORE_XML_FIELDS.get(tag)
+        if key in ('created', 'modified') and text.strip():
+            try:
+                text = iso_datetime(datetime.fromisoformat(text.strip().replace('Z', '+00:00')))
+            except ValueError:
+                pass
+        elif key == 'revision':
+            text = int(text) if text.strip().isdigit() and int(text) else ''
+        if key:
+            props[key] = text
+    return props
+
+def docx_document_stats(app_xml):
+    """
+    Read Word document counts from docProps/app.xml.
+    Word refreshes these when it saves; other tools (python-docx included)
+    leave them as they were, so they are labelled with the saving application
+    and counts missing from app.xml are left out rather than reported as 0.
+    """
+    app = read_xml_part(app_xml)
+    stats = {
+        'source': f"Counts as last saved by {app.get('Application') or 'an unknown application'}"
+    }
+    for key, count_key in DOCX_APP_COUNTS.items():
+        if app.get(key, '').strip().isdigit():
+            stats[count_key] = int(app[key])
+    return stats
+
+def extract_docx_metadata(input_file):
     """Extract metadata from Word documents with error handling"""
     try:
-        doc = Document(file_path)
-        props = doc.core_properties
-        
-        return {
-            'CoreProperties': {
-                'title': props.title or '',
-                'author': props.author or '',
-                'subject': props.subject or '',
-                'keywords': props.keywords or '',
-                'comments': props.comments or '',
-                'last_modified_by': props.last_modified_by or '',
-                'created': props.created.isoformat() if props.created else '',
-                'modified': props.modified.isoformat() if props.modified else '',
-                'category': props.category or '',
-                'content_status': props.content_status or '',
-                'identifier': props.identifier or '',
-                'language': props.language or '',
-                'revision': props.revision or '',
-                'version': props.version or ''
-            },
-            'DocumentStats': {
-                'paragraph_count': len(doc.paragraphs),
-                'tables_count': len(doc.tables),
-                'sections_count': len(doc.sections)
+        with zipfile.ZipFile(input_file) as zf:
+            return {
+                'CoreProperties': read_core_properties(read_zip_part(zf, CORE_PART)),
+                'DocumentStats': docx_document_stats(read_zip_part(zf, APP_PART))
             }
-        }
     except Exception as e:
         return {'Error': f'DOCX Metadata Error: {str(e)}'}
 
-def update_docx_metadata(input_path, changes):
-    """Update Word document metadata and return path to new file"""
+def update_docx_metadata(input_file, changes):
+    """Update Word document metadata and return path to new file with its metadata"""
+    from docx import Document
+
     try:
-        # Create temp output path
-        output_path = f"modified_{os.path.basename(input_path)}"
-        
-        # Make a copy of the original file
-        with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
-            dst.write(src.read())
-        
-        # Open the copy and update metadata
-        doc = Document(output_path)
+        # Create a unique temp output file so concurrent sessions never share one
+        with tempfile.NamedTemporaryFile(delete=False, prefix='modified_', suffix='.docx') as out_file:
+            output_path = out_file.name
+        
+        # Open the original once and update metadata
+        if hasattr(input_file, 'seek'):
+            input_file.seek(0)
+        doc = Document(input_file)
         props = doc.core_properties
         
         # Apply changes
         for key, value in changes.items():
             if hasattr(props, key):
                 setattr(props, key, value)
+                # Verify against the in-memory XML rather than reopening the saved file
+                if str(getattr(props, key)) != str(value):
+                    raise ValueError(f"Failed to update {key}")
         
         # Force modification date update
         props.modified = datetime.now()
@@ -61,70 +151,62 @@ def update_docx_metadata(input_path, changes):
         # Save changes
         doc.save(output_path)
         
-        # Verify the update
-        updated_doc = Document(output_path)
-        for key in changes:
-            if str(getattr(updated_doc.core_properties, key, '')) != str(changes[key]):
-                raise ValueError(f"Failed to update {key}")
+        # Counts come from the parts already in memory, not a reopen of the saved file
+        app_part = package_parts(doc.part.package).get(APP_PART)
+        stats = docx_document_stats(app_part.blob if app_part else None)
         
-        return output_path
+        return output_path, {
+            'CoreProperties': core_properties_dict(props),
+            'DocumentStats': stats
+        }
         
     except Exception as e:
         # Clean up if failed
-        if os.path.exists(output_path):
+        if 'output_path' in locals() and os.path.exists(output_path):
             os.remove(output_path)
         return {'Error': f'DOCX Update Error: {str(e)}'}
 
-def extract_pptx_metadata(file_path):
+def pptx_presentation_stats(names):
+    """Count slides, notes and masters from the package part names"""
+    return {
+        'slide_count': sum(1 for name in names if PPTX_SLIDE_PART.match(name)),
+        'notes_slide_count': sum(1 for name in names if PPTX_NOTES_PART.match(name)),
+        'master_slide_count': sum(1 for name in names if PPTX_MASTER_PART.match(name))
+    }
+
+def extract_pptx_metadata(input_file):
     """Extract metadata from PowerPoint files with error handling"""
     try:
-        prs = Presentation(file_path)
-        props = prs.core_properties
-        
-        return {
-            'CoreProperties': {
-                'title': props.title or '',
-                'author': props.author or '',
-                'subject': props.subject or '',
-                'keywords': props.keywords or '',
-                'comments': props.comments or '',
-                'last_modified_by': props.last_modified_by or '',
-                'created': props.created.isoformat() if props.created else '',
-                'modified': props.modified.isoformat() if props.modified else '',
-                'category': props.category or '',
-                'content_status': props.content_status or '',
-                'identifier': props.identifier or '',
-                'language': props.language or '',
-                'revision': props.revision or '',
-                'version': props.version or ''
-            },
-            'PresentationStats': {
-                'slide_count': len(prs.slides),
-                'notes_slide_count': len(prs.slides._sldIdLst),
-                'master_slide_count': len(prs.slide_masters)
+        with zipfile.ZipFile(input_file) as zf:
+            return {
+                'CoreProperties': read_core_properties(read_zip_part(zf, CORE_PART)),
+                'PresentationStats': pptx_presentation_stats(zf.namelist())
             }
-        }
     except Exception as e:
         return {'Error': f'PPTX Metadata Error: {str(e)}'}
 
-def update_pptx_metadata(input_path, changes):
-    """Update PowerPoint metadata and return path to new file"""
+def update_pptx_metadata(input_file, changes):
+    """Update PowerPoint metadata and return path to new file with its metadata"""
+    from pptx import Presentation
+
     try:
-        # Create temp output path
-        output_path = f"modified_{os.path.basename(input_path)}"
-        
-        # Make a copy of the original file
-        with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
-            dst.write(src.read())
-        
-        # Open the copy and update metadata
-        prs = Presentation(output_path)
+        # Create a unique temp output file so concurrent sessions never share one
+        with tempfile.NamedTemporaryFile(delete=False, prefix='modified_', suffix='.pptx') as out_file:
+            output_path = out_file.name
+        
+        # Open the original once and update metadata
+        if hasattr(input_file, 'seek'):
+            input_file.seek(0)
+        prs = Presentation(input_file)
         props = prs.core_properties
         
         # Apply changes
         for key, value in changes.items():
             if hasattr(props, key):
                 setattr(props, key, value)
+                # Verify against the in-memory XML rather than reopening the saved file
+                if str(getattr(props, key)) != str(value):
+                    raise ValueError(f"Failed to update {key}")
         
         # Force modification date update
         props.modified = datetime.now()
@@ -132,16 +214,16 @@ def update_pptx_metadata(input_path, changes):
         # Save changes
         prs.save(output_path)
         
-        # Verify the update
-        updated_prs = Presentation(output_path)
-        for key in changes:
-            if str(getattr(updated_prs.core_properties, key, '')) != str(changes[key]):
-                raise ValueError(f"Failed to update {key}")
+        # Counts come from the parts already in memory, not a reopen of the saved file
+        stats = pptx_presentation_stats(package_parts(prs.part.package))
         
-        return output_path
+        return output_path, {
+            'CoreProperties': core_properties_dict(props),
+            'PresentationStats': stats
+        }
         
     except Exception as e:
         # Clean up if failed
-        if os.path.exists(output_path):
+        if 'output_path' in locals() and os.path.exists(output_path):
             os.remove(output_path)
         return {'Error': f'PPTX Update Error: {str(e)}'}
\ No newline at end of file